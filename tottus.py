@@ -1,7 +1,23 @@
 import asyncio
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
-import json
+import orjson
+import re
+
+# El payload de __NEXT_DATA__ no contiene "<" (Next.js lo escapa), así que
+# basta con capturar hasta el siguiente "<" sin construir ningún árbol HTML
+NEXT_DATA_RE = re.compile(rb'id="__NEXT_DATA__"[^>]*>([^<]+)')
+
+# Recursos y trackers que no influyen en __NEXT_DATA__: no vale la pena descargarlos
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet", "other"}
+BLOCKED_URL_PARTS = ("google-analytics", "googletagmanager", "doubleclick")
+
+async def block_unneeded_resources(route):
+    # Se aborta la request si es un recurso bloqueado o va a un dominio de analytics
+    is_tracker = any(part in route.request.url for part in BLOCKED_URL_PARTS)
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES or is_tracker:
+        await route.abort()
+    else:
+        await route.continue_()
 
 async def get_next_data_json():
     async with async_playwright() as p:
@@ -10,20 +26,21 @@ async def get_next_data_json():
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
             locale="es-CL"
         )
+        await context.route("**/*", block_unneeded_resources)
         page = await context.new_page()
         await page.goto("https://www.tottus.cl/tottus-cl", timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        html = await page.content()
+        await page.wait_for_selector("script#__NEXT_DATA__", state="attached", timeout=20000)
+        html = (await page.content()).encode("utf-8")
         await browser.close()
 
         # Extraer el JSON del script
-        soup = BeautifulSoup(html, "html.parser")
-        script_tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
-        if script_tag:
-            data_json = json.loads(script_tag.string)
-            # Guarda el JSON en un archivo para usarlo en Jupyter
-            with open("tottus_next_data.json", "w", encoding="utf-8") as f:
-                json.dump(data_json, f, ensure_ascii=False, indent=2)
+        match = NEXT_DATA_RE.search(html)
+        if match:
+            data_json = orjson.loads(match.group(1))
+            # Guarda el JSON compacto en un archivo para usarlo en Jupyter
+            # (si hace falta leerlo a mano, se puede indentar allá al mostrarlo)
+            with open("tottus_next_data.json", "wb") as f:
+                f.write(orjson.dumps(data_json, option=orjson.OPT_NON_STR_KEYS))
             print("JSON guardado en tottus_next_data.json")
         else:
             print("No se encontró el script __NEXT_DATA__")
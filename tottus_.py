@@ -1,179 +1,453 @@
-import json
+import orjson
 import os
+import re
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+import httpx
+import simdjson
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # Faster libuv-based event loop; not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+# Number of categories scraped at the same time (one browser page each)
+MAX_CONCURRENT_CATEGORIES = 5
+
+# Page requests per second allowed across all concurrent category tasks
+REQUESTS_PER_SECOND = 5
+
+# __NEXT_DATA__ script body in raw HTML bytes. Next.js escapes "<" inside the
+# JSON, so the payload ends at the first "<" (no nested </script> pitfalls).
+NEXT_DATA_RE = re.compile(rb'id="__NEXT_DATA__"[^>]*>([^<]+)')
+
+# Browser fallback: navigation only waits for DOMContentLoaded, then at most
+# this long for __NEXT_DATA__ to be attached before reading the DOM anyway
+NEXT_DATA_WAIT_MS = 5000
+
+# HTTP statuses meaning the site refuses plain HTTP clients (bot protection);
+# any other error status only sends that one URL to the browser
+HTTP_REJECTED_STATUSES = {401, 403}
+
+# On 429 the shared limiter pauses (Retry-After, or this default) and the same
+# URL is retried over HTTP up to this many times
+HTTP_RATE_LIMIT_RETRIES = 3
+HTTP_DEFAULT_BACKOFF_SECONDS = 10
+
+# Connections kept by the shared HTTP client used for the no-browser fast path
+HTTP_MAX_CONNECTIONS = 20
+
+# Worker threads used to parse __NEXT_DATA__ off the event loop
+JSON_DECODE_WORKERS = 4
+
+# Requests that never affect __NEXT_DATA__ and are not worth downloading
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet", "other"}
+BLOCKED_URL_PARTS = ("google-analytics", "googletagmanager", "doubleclick")
+
+async def block_unneeded_resources(route):
+    """Playwright route handler that aborts assets and third-party trackers."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(part in request.url for part in BLOCKED_URL_PARTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+# Where the categories cards live inside __NEXT_DATA__ (container, component),
+# discovered on the first scan and persisted next to this script.
+CARDS_PATH_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache.json")
+_CARDS_PATH = None
+
+def load_cards_path():
+    """Returns the cached (container, component) indices of the categories cards, if any."""
+    global _CARDS_PATH
+    if _CARDS_PATH is None:
+        try:
+            with open(CARDS_PATH_CACHE_FILE, "rb") as f:
+                i, j = orjson.loads(f.read())["cards_path"]
+            _CARDS_PATH = (int(i), int(j))
+        except (OSError, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            return None
+    return _CARDS_PATH
+
+def save_cards_path(cards_path):
+    """Remembers the categories cards indices in memory and in the cache file."""
+    global _CARDS_PATH
+    if cards_path == _CARDS_PATH:
+        return
+    _CARDS_PATH = cards_path
+    try:
+        with open(CARDS_PATH_CACHE_FILE, "wb") as f:
+            f.write(orjson.dumps({"cards_path": list(cards_path)}))
+    except OSError as e:
+        print(f"Could not save cards path cache to '{CARDS_PATH_CACHE_FILE}': {e}")
+
+# Turned off for the rest of the run once the site rejects plain HTTP requests
+# (e.g. 403 from bot protection), so pages go straight to the browser instead
+# of paying for a failing request first.
+_SSR_FAST_PATH_ENABLED = True
 
 # --- Tottus Scraper Functions (Asynchronous with Playwright) ---
 
-async def get_tottus_data_from_page(page, url):
+@asynccontextmanager
+async def open_page(context):
+    """Opens a new page on the context and closes it when done."""
+    page = await context.new_page()
+    try:
+        yield page
+    finally:
+        await page.close()
+
+def retry_after_seconds(response):
+    """Seconds to wait according to a 429 response's Retry-After header."""
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 0)
+    except ValueError:
+        return HTTP_DEFAULT_BACKOFF_SECONDS
+
+async def get_tottus_next_data_raw_http(client, url, limiter):
     """
-    Navigates to a URL using Playwright, waits for network idle,
-    and extracts the __NEXT_DATA__ JSON from the HTML.
+    Fetches a URL with plain HTTP, taking a limiter token per request.
+    Returns (raw, use_browser): raw is the __NEXT_DATA__ JSON text (bytes)
+    embedded in the server-rendered HTML or None, and use_browser tells the
+    caller whether the browser should be tried for this URL.
+    """
+    global _SSR_FAST_PATH_ENABLED
+    for _ in range(HTTP_RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 429:
+                # The browser would be throttled too: slow everyone down and retry
+                delay = retry_after_seconds(e.response)
+                print(f"HTTP request for {url} was rate limited (429), backing off {delay:.0f} s.")
+                limiter.back_off(delay)
+                continue
+            if status in HTTP_REJECTED_STATUSES:
+                print(f"HTTP request for {url} was rejected ({status}), using only the browser from now on.")
+                _SSR_FAST_PATH_ENABLED = False
+            else:
+                print(f"HTTP request for {url} failed with status {status}.")
+            return None, True
+        except httpx.HTTPError as e:
+            print(f"HTTP request for {url} failed: {e}")
+            return None, True
+
+        # Scan the undecoded body directly, no text decoding or HTML parsing
+        match = NEXT_DATA_RE.search(response.content)
+        if match:
+            return match.group(1), False
+        print(f"__NEXT_DATA__ not in server-rendered HTML of {url}.")
+        return None, True
+
+    print(f"Still rate limited after {HTTP_RATE_LIMIT_RETRIES} retries for {url}, skipping it.")
+    return None, False
+
+async def get_tottus_next_data_raw_browser(page, url):
+    """
+    Navigates to a URL using Playwright, waits (bounded) for the __NEXT_DATA__
+    script to be attached and returns its raw JSON text (bytes) from the DOM.
     """
     try:
-        await page.goto(url, timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        html = await page.content()
-        
-        soup = BeautifulSoup(html, "html.parser")
-        script_tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        try:
+            await page.wait_for_selector("script#__NEXT_DATA__", state="attached", timeout=NEXT_DATA_WAIT_MS)
+        except PlaywrightTimeoutError:
+            # Don't let slow third-party requests stall the scrape; read what is there
+            print(f"__NEXT_DATA__ not attached after {NEXT_DATA_WAIT_MS} ms on {url}, reading the DOM anyway.")
+        # Read the script body straight from the live DOM, no HTML re-parse needed
+        raw = await page.evaluate("() => document.getElementById('__NEXT_DATA__')?.textContent ?? null")
         
-        if script_tag:
-            if script_tag.string:
-                print(f"__NEXT_DATA__ script found and has content on {url}.")
-                return json.loads(script_tag.string)
-            else:
-                print(f"__NEXT_DATA__ script found on {url} but its content is empty.")
-                return None
-        else:
+        if raw is None:
             print(f"No __NEXT_DATA__ script found on {url}")
-            # Optionally, save the HTML to a file for manual inspection
-            # with open("debug_tottus_page.html", "w", encoding="utf-8") as f:
-            #     f.write(html)
-            # print("Saved current page HTML to debug_tottus_page.html for inspection.")
+            return None
+        elif raw:
+            print(f"__NEXT_DATA__ script found and has content on {url}.")
+            return raw.encode("utf-8")
+        else:
+            print(f"__NEXT_DATA__ script found on {url} but its content is empty.")
             return None
     except Exception as e:
         print(f"Error fetching data from {url}: {e}")
         return None
 
-async def get_tottus_categories_async():
+async def get_tottus_next_data_raw(client, get_page, url, limiter):
+    """
+    Returns the raw __NEXT_DATA__ JSON bytes of a URL. The server-rendered HTML
+    is tried first over HTTP; a Playwright page is only borrowed from
+    `get_page` when the script is missing from it (client-rendered pages) or
+    the request fails. Every actual request takes its own limiter token.
+    """
+    if _SSR_FAST_PATH_ENABLED:
+        raw, use_browser = await get_tottus_next_data_raw_http(client, url, limiter)
+        if raw:
+            print(f"__NEXT_DATA__ found in server-rendered HTML of {url}.")
+            return raw
+        if not use_browser:
+            return None
+        print(f"Falling back to the browser for {url}.")
+    await limiter.acquire()
+    async with get_page() as page:
+        return await get_tottus_next_data_raw_browser(page, url)
+
+def parse_and_extract(parser, raw, extract):
+    """
+    Parses raw JSON with a (reused) simdjson parser and returns extract(doc).
+    The document only lives inside this call, so the parser is free again
+    for the next page as long as extract returns plain Python objects.
+    """
+    return extract(parser.parse(raw))
+
+async def get_tottus_data_from_page(client, get_page, url, limiter, parser, extract):
+    """
+    Fetches the __NEXT_DATA__ JSON of a URL, parses it with the given simdjson
+    parser and returns what `extract` copies out of the document.
+    """
+    raw = await get_tottus_next_data_raw(client, get_page, url, limiter)
+    if not raw:
+        return None
+    try:
+        # Parse in a worker thread so other scrape tasks keep running meanwhile
+        return await asyncio.to_thread(parse_and_extract, parser, raw, extract)
+    except ValueError as e:
+        print(f"Error decoding __NEXT_DATA__ from {url}: {e}")
+        return None
+
+async def get_tottus_categories_async(client, context, limiter):
     """
     Fetches Tottus categories by navigating to the main page
     and extracting category links from the __NEXT_DATA__ JSON.
     """
-    async with async_playwright() as p:
-        # Launch browser in non-headless mode for debugging
-        browser = await p.chromium.launch(headless=False) 
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-            locale="es-CL"
-        )
-        page = await context.new_page()
-        
-        print("Fetching Tottus categories...")
-        data = await get_tottus_data_from_page(page, "https://www.tottus.cl/tottus-cl")
-        await browser.close()
+    print("Fetching Tottus categories...")
+    # A browser page is only opened if the HTTP fast path fails
+    raw = await get_tottus_next_data_raw(client, lambda: open_page(context), "https://www.tottus.cl/tottus-cl", limiter)
 
-        if not data:
-            print("Failed to retrieve Tottus categories data.")
-            return []
+    if not raw:
+        print("Failed to retrieve Tottus categories data.")
+        return []
 
-        print(f"Keys in __NEXT_DATA__ for categories: {data.keys()}") # Debug print
+    # Only the category cards are needed, so navigate the document lazily with
+    # simdjson instead of materializing the whole __NEXT_DATA__ tree.
+    parser = simdjson.Parser()
+    try:
+        data = parser.parse(raw)
+    except ValueError as e:
+        print(f"Error decoding Tottus categories __NEXT_DATA__: {e}")
+        return []
 
-        # Parse the JSON for top-level category links
-        # Path: data['props']['pageProps']['page']['containers'][20]['components'][18]['data']['cards']
-        categories = []
-        try:
-            # Safely get nested dictionary values
+    print(f"Keys in __NEXT_DATA__ for categories: {list(data.keys())}") # Debug print
+
+    # Parse the JSON for top-level category links
+    # Path: data['props']['pageProps']['page']['containers'][i]['components'][j]['data']['cards']
+    categories = []
+    try:
+        # Fast path: try the (container, component) indices found on a previous run
+        target_component = None
+        cards_path = load_cards_path()
+        if cards_path is not None:
+            i, j = cards_path
+            try:
+                target_component = data['props']['pageProps']['page']['containers'][i]['components'][j]['data']['cards']
+            except (KeyError, IndexError, TypeError):
+                target_component = None
+            # Only trust the cached path if it still leads to a non-empty list of cards
+            if not (isinstance(target_component, simdjson.Array) and len(target_component)):
+                print(f"Cached cards path {cards_path} no longer matches, scanning containers.")
+                target_component = None
+
+        if target_component is None:
+            # Safely get nested values (simdjson.Object supports dict-style .get)
             cards = data.get('props', {}).get('pageProps', {}).get('page', {}).get('containers', [])
             
             # Find the correct container and component
-            target_component = None
-            for container in cards:
-                if isinstance(container, dict) and 'components' in container:
-                    for component in container['components']:
-                        if isinstance(component, dict) and component.get('data', {}).get('cards') is not None:
+            for i, container in enumerate(cards):
+                if isinstance(container, simdjson.Object) and 'components' in container:
+                    for j, component in enumerate(container['components']):
+                        if isinstance(component, simdjson.Object) and component.get('data', {}).get('cards') is not None:
                             # This is a heuristic. We're looking for a component that has 'data' and 'cards' within it.
-                            # The original path was very specific [20]['components'][18].
-                            # Let's try to be more flexible.
-                            # If the original path is consistently correct, you can revert to:
-                            # cards_data = data['props']['pageProps']['page']['containers'][20]['components'][18]['data']['cards']
-                            
-                            # For now, let's assume the cards are directly under 'data'
-                            if 'cards' in component['data']:
-                                target_component = component['data']['cards']
+                            # The indices found here are cached so the next run can index directly.
+                            found_cards = component['data']['cards']
+                            if isinstance(found_cards, simdjson.Array) and len(found_cards):
+                                target_component = found_cards
+                                save_cards_path((i, j))
                                 break
                 if target_component:
                     break
 
-            if target_component:
-                for card in target_component:
-                    link = card.get('link')
-                    if link and isinstance(link, str) and link.startswith('/'):
-                        categories.append(link)
-            else:
-                print("Could not find the 'cards' data at the expected or an alternative path for categories.")
+        if target_component:
+            for card in target_component:
+                # Only the link strings are copied out of the simdjson document
+                link = card.get('link')
+                if link and isinstance(link, str) and link.startswith('/'):
+                    categories.append(link)
+        else:
+            print("Could not find the 'cards' data at the expected or an alternative path for categories.")
 
-        except KeyError as e:
-            print(f"Could not find Tottus category links at expected path: {e}")
-            return []
-        except Exception as e:
-            print(f"An error occurred while parsing Tottus categories: {e}")
-            return []
-        
-        return categories
+    except KeyError as e:
+        print(f"Could not find Tottus category links at expected path: {e}")
+        return []
+    except Exception as e:
+        print(f"An error occurred while parsing Tottus categories: {e}")
+        return []
+    
+    return categories
 
-async def get_tottus_products_by_category_async(category_url_path):
+class PagePool:
+    """
+    Small pool of pre-warmed Playwright pages shared by concurrent tasks.
+    Pages are handed out through an asyncio.Queue, so no lock is needed.
+    """
+    def __init__(self):
+        self._pages = asyncio.Queue()
+
+    async def fill(self, context, size):
+        for _ in range(size):
+            self._pages.put_nowait(await context.new_page())
+
+    @asynccontextmanager
+    async def get_page(self):
+        page = await self._pages.get()
+        try:
+            yield page
+        finally:
+            self._pages.put_nowait(page)
+
+class RateLimiter:
+    """
+    Token bucket shared by every scrape task: allows `rate` requests per second
+    on average, with bursts of up to `rate` requests.
+    """
+    def __init__(self, rate):
+        self._rate = rate
+        self._tokens = rate
+        self._last = None
+        self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def back_off(self, delay):
+        """Stops handing out tokens for `delay` seconds (e.g. after a 429)."""
+        resume_at = asyncio.get_running_loop().time() + delay
+        if resume_at > self._resume_at:
+            self._resume_at = resume_at
+            # Start from an empty bucket once the pause is over, no burst
+            self._tokens = 0
+            self._last = resume_at
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if now < self._resume_at:
+                    await asyncio.sleep(self._resume_at - now)
+                    continue
+                if self._last is not None:
+                    self._tokens = min(self._rate, self._tokens + max(now - self._last, 0) * self._rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+def extract_product_page(data):
+    """
+    Copies the product URLs and pagination hints out of a product listing
+    __NEXT_DATA__ document into plain Python objects.
+    """
+    # --- Updated JSON path for Tottus products ---
+    # Path: data['props']['pageProps']['results']
+    page_props = data.get('props', {}).get('pageProps', {})
+    results = page_props.get('results')
+    if not isinstance(results, simdjson.Array):
+        return {"results_type": type(results).__name__, "product_count": 0, "urls": None}
+
+    # Pagination hints are optional: a missing or oddly shaped hint must never
+    # cost the page's results, so only read them from the expected types
+    total_pages = page_props.get('totalPages')
+    pagination = page_props.get('pagination')
+    if not total_pages and isinstance(pagination, simdjson.Object):
+        total_pages = pagination.get('totalPages')
+    return {
+        "results_type": "list",
+        "product_count": len(results),
+        # Extract 'url' instead of 'slug' as per the new requirement
+        "urls": [url for product in results if isinstance(url := product.get("url"), str) and url],
+        "end_of_results": page_props.get('endOfResults') is True,
+        "total_pages": total_pages if isinstance(total_pages, int) else None,
+    }
+
+async def get_tottus_products_by_category_async(client, get_page, category_url_path, limiter):
     """
     Fetches products for a specific Tottus category, iterating through pages
-    using Playwright and extracting slugs from __NEXT_DATA__.
+    over HTTP (or a Playwright page from `get_page` as fallback) and
+    extracting slugs from __NEXT_DATA__.
+    Every request waits for a token from the shared rate limiter.
     """
-    all_product_slugs = []
+    all_product_slugs = set()
     page_num = 1
     base_url = "https://www.tottus.cl"
-    
-    async with async_playwright() as p:
-        # Launch browser in non-headless mode for debugging
-        browser = await p.chromium.launch(headless=False) 
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-            locale="es-CL"
-        )
-        page = await context.new_page()
+    # One parser per category task: its internal buffers are sized once and
+    # reused for every page instead of being reallocated per parse
+    parser = simdjson.Parser()
 
-        print(f"--- Fetching Tottus products for category: {category_url_path} ---")
+    print(f"--- Fetching Tottus products for category: {category_url_path} ---")
 
-        while True:
-            current_product_list_url = f"{base_url}{category_url_path}?page={page_num}&store=to_com"
-            print(f"Accessing: {current_product_list_url}")
-            
-            data = await get_tottus_data_from_page(page, current_product_list_url)
-            
-            if not data:
-                print(f"No data retrieved for {category_url_path} page {page_num}. Ending pagination.")
-                break
+    while True:
+        current_product_list_url = f"{base_url}{category_url_path}?page={page_num}&store=to_com"
+        print(f"Accessing: {current_product_list_url}")
+        
+        try:
+            page_info = await get_tottus_data_from_page(client, get_page, current_product_list_url, limiter, parser, extract_product_page)
+        except Exception as e:
+            print(f"Error parsing Tottus products from __NEXT_DATA__ for {category_url_path} page {page_num}: {e}")
+            break # End pagination on parsing error
+        
+        if not page_info:
+            print(f"No data retrieved for {category_url_path} page {page_num}. Ending pagination.")
+            break
 
-            products = []
-            try:
-                # --- Updated JSON path for Tottus products ---
-                # Path: data['props']['pageProps']['results']
-                results = data.get('props', {}).get('pageProps', {}).get('results')
-                if isinstance(results, list):
-                    products = results
-                else:
-                    print(f"Expected 'results' to be a list, but got {type(results)} for {category_url_path} page {page_num}.")
-                    break # End pagination if results are not as expected
-
-            except Exception as e:
-                print(f"Error parsing Tottus products from __NEXT_DATA__ for {category_url_path} page {page_num}: {e}")
-                break # End pagination on parsing error
-
-            if not products:
-                print(f"No products extracted for {category_url_path} page {page_num}.")
-                break # No products, end pagination
-
-            initial_slug_count = len(all_product_slugs)
-            for product in products:
-                # Extract 'url' instead of 'slug' as per the new requirement
-                product_url = product.get("url")
-                if product_url and isinstance(product_url, str):
-                    all_product_slugs.append(product_url)
-            
-            if len(all_product_slugs) == initial_slug_count:
-                print(f"No new Tottus products found on page {page_num} for {category_url_path}. Ending pagination.")
-                break # No new products, end pagination
+        if page_info["urls"] is None:
+            print(f"Expected 'results' to be a list, but got {page_info['results_type']} for {category_url_path} page {page_num}.")
+            break # End pagination if results are not as expected
+
+        if not page_info["product_count"]:
+            print(f"No products extracted for {category_url_path} page {page_num}.")
+            break # No products, end pagination
+
+        initial_slug_count = len(all_product_slugs)
+        all_product_slugs.update(page_info["urls"])
+        
+        if len(all_product_slugs) == initial_slug_count:
+            print(f"No new Tottus products found on page {page_num} for {category_url_path}. Ending pagination.")
+            break # No new products, end pagination
 
-            page_num += 1
-            await asyncio.sleep(1) # Be polite and avoid hammering the server
+        # Stop as soon as the listing says this was the last page, instead of
+        # fetching one more page just to find out it adds nothing
+        if page_info["end_of_results"]:
+            print(f"Reached end of results on page {page_num} for {category_url_path}. Ending pagination.")
+            break
+        total_pages = page_info["total_pages"]
+        if total_pages is not None and page_num >= total_pages:
+            print(f"Reached last page ({total_pages}) for {category_url_path}. Ending pagination.")
+            break
+
+        page_num += 1
 
-        await browser.close()
     return all_product_slugs
 
-async def run_tottus_scraper():
+async def run_tottus_scraper(client, context):
     """Main function to run the Tottus scraper."""
     print("Starting Tottus scraper...")
-    categories = await get_tottus_categories_async()
+    # Shared by every request of the run (HTTP or browser) to be polite with the server
+    limiter = RateLimiter(REQUESTS_PER_SECOND)
+    categories = await get_tottus_categories_async(client, context, limiter)
     if not categories:
         print("No Tottus categories found. Exiting Tottus scraper.")
         return
@@ -181,23 +455,55 @@ async def run_tottus_scraper():
     print(f"Found {len(categories)} Tottus category URLs.")
     # print(categories) # Uncomment to see the list of extracted category URLs
 
-    all_product_slugs = []
+    output_filename = "tottus_product_urls.txt" # Changed filename to reflect URLs
+    # Each category's URLs are appended here as soon as it finishes, so they are
+    # not all held in memory and survive a crash half-way through the run
+    partial_filename = output_filename + ".tmp"
+
+    # A fixed set of pages from the shared context, reused by every category task
+    pool = PagePool()
+    await pool.fill(context, MAX_CONCURRENT_CATEGORIES)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CATEGORIES)
 
-    for category_url_path in categories:
+    async def run_category(category_url_path):
         # Example category_url_path: /tottus-cl/lista/CATG27055/Despensa
-        slugs = await get_tottus_products_by_category_async(category_url_path)
-        all_product_slugs.extend(slugs)
-        print(f"Finished processing Tottus category URL: {category_url_path}. Total slugs collected so far: {len(all_product_slugs)}")
+        # Pages are only borrowed from the pool for browser fallbacks
+        async with semaphore:
+            slugs = await get_tottus_products_by_category_async(client, pool.get_page, category_url_path, limiter)
+        return category_url_path, slugs
 
-    unique_slugs = sorted(list(set(all_product_slugs)))
+    written_count = 0
+    tasks = [asyncio.create_task(run_category(c)) for c in categories]
+    try:
+        with open(partial_filename, 'wb', buffering=1024 * 1024) as out:
+            for next_done in asyncio.as_completed(tasks):
+                category_url_path, slugs = await next_done
+                if slugs:
+                    out.write(b"\n".join(url.encode("utf-8") for url in slugs) + b"\n")
+                    out.flush()
+                    written_count += len(slugs)
+                print(f"Finished processing Tottus category URL: {category_url_path}. URLs written so far: {written_count}")
+
+        # Single pass over the partial file to deduplicate across categories
+        with open(partial_filename, 'rb') as f:
+            unique_slugs = sorted({line.rstrip(b"\n").decode("utf-8") for line in f if line.strip()})
+    except IOError as e:
+        print(f"Error with Tottus partial URLs file '{partial_filename}': {e}")
+        return
+    finally:
+        # Don't leave category tasks running against a browser/client about to close
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     print(f"\n--- Tottus Product Slugs Collected ---")
     print(f"Total unique Tottus product slugs found across all categories: {len(unique_slugs)}") 
 
-    output_filename = "tottus_product_urls.txt" # Changed filename to reflect URLs
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            for url in unique_slugs: # Iterate through URLs
-                f.write(url + '\n')
+        # Join and encode once, then hand the whole block to a single buffered write
+        data = ("\n".join(unique_slugs) + "\n").encode("utf-8") if unique_slugs else b""
+        with open(output_filename, 'wb', buffering=1024 * 1024) as f:
+            f.write(data)
+        os.remove(partial_filename)
         print(f"Successfully saved {len(unique_slugs)} unique Tottus product URLs to '{output_filename}'")
         current_directory = os.getcwd()
         full_path = os.path.join(current_directory, output_filename)
@@ -214,11 +520,36 @@ async def main():
     Main entry point for running the supermarket scrapers.
     Currently set to run only the Tottus scraper.
     """
-    await run_tottus_scraper()
+    # Bounded pool for the JSON parsing offloaded with asyncio.to_thread
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=JSON_DECODE_WORKERS))
+
+    # One HTTP/2 client for server-rendered pages, plus a single headless
+    # Chromium and context shared by the whole run as fallback
+    async with httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT, "Accept-Language": "es-CL"},
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS),
+    ) as client, async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(
+            user_agent=USER_AGENT,
+            locale="es-CL"
+        )
+        # Applies to every page opened from this context
+        await context.route("**/*", block_unneeded_resources)
+        try:
+            await run_tottus_scraper(client, context)
+        finally:
+            await browser.close()
 
 if __name__ == "__main__":
     # Ensure playwright browsers are installed:
     # You might need to run `playwright install` in your terminal if you haven't already.
     # This command needs to be run once in your environment.
     # `playwright install`
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file